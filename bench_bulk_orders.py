@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Wall-clock time of a 50-order ladder requote against the local stand-in server:
+REST and WS one call at a time vs. BulkWsExecutor, with the default WS rate limit (50/s) and with
+rate limiting lifted. The stand-in rejects out-of-order nonces like CEX.io.
+
+    python bench_bulk_orders.py --latency 0.05 --jitter 0.02 --orders 50
+"""
+import argparse
+import time
+
+from cex_bulk import FAILED, OK, UNKNOWN, BulkWsExecutor, OrderResult, RateLimiter, cancel_replace
+from cex_client2 import CexClient
+from cex_standin_server import StandInServer, jitter_latency
+from cexws_client import CexWsClient
+
+
+def ladder(orders, pair="BTC/USD"):
+    intents = []
+    for i in range(orders):
+        op = "buy" if i % 2 == 0 else "sell"
+        price = 100.0 - (i // 2) * 0.5 if op == "buy" else 101.0 + (i // 2) * 0.5
+        intents.append(cancel_replace(order_id=1000 + i, pair=pair, op=op, amount=0.01, price=price))
+    return intents
+
+
+def rest_one_at_a_time(api, intents):
+    results = []
+    for intent in intents:
+        response = api.cancel_replace_order(pair=intent.pair, op=intent.op, amount=intent.amount, price=intent.price,
+                                            order_id=intent.order_id)
+        if response == {}:
+            results.append(OrderResult(intent, UNKNOWN, response, "No response"))
+        elif "error" in response:
+            results.append(OrderResult(intent, FAILED, response, response["error"]))
+        else:
+            results.append(OrderResult(intent, OK, response, None))
+    return results
+
+
+def timed(name, func, intents):
+    started = time.time()
+    results = func(intents)
+    elapsed = time.time() - started
+    failed = len([r for r in results if r.status != OK])
+    unknown = len([r for r in results if r.status == UNKNOWN])
+    print("%-40s %8.3f s  (%s orders, %s failed, %s unknown)" % (name, elapsed, len(results), failed, unknown))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in server latency per request, seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="random +/- latency jitter, seconds")
+    parser.add_argument("--orders", type=int, default=50)
+    args = parser.parse_args()
+
+    server = StandInServer(latency=jitter_latency(args.latency, args.jitter)).start()
+    intents = ladder(args.orders)
+
+    api = CexClient(username="bench", api_key="key", api_secret="secret", timeout=10)
+    api.base_url = server.rest_url
+
+    ws_cli = CexWsClient("bench", "key", "secret")
+    ws_cli.url = server.ws_url
+    ws_cli.connect_and_run()
+    while not ws_cli.is_authenticated:
+        time.sleep(0.01)
+
+    print("Requote of %s orders, %.0f +/- %.0f ms per request:" % (args.orders, args.latency * 1000,
+                                                                   args.jitter * 1000))
+    timed("REST one at a time", lambda intents: rest_one_at_a_time(api, intents), intents)
+    for limits, rate_limiter in (("default limit", None), ("no rate limit", RateLimiter(1e6, 1e6))):
+        bulk_ws = BulkWsExecutor(ws_cli, rate_limiter=rate_limiter)
+
+        def sequential_ws(intents):
+            return [bulk_ws.execute([intent])[0] for intent in intents]
+
+        timed("WS one at a time, %s" % limits, sequential_ws, intents)
+        timed("WS bulk (pipelined), %s" % limits, bulk_ws.execute, intents)
+
+    # Close the connection directly: CexWsClient.stop() expects the thread started by start().
+    ws_cli.stop_flag = True
+    ws_cli.connection.close()
+    ws_cli.connection_thread.join()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Latency of public REST reads with and without hedging against the local stand-in server,
+where a share of requests stalls for a long time.
+
+    python bench_hedged_reads.py --requests 500 --latency 0.02 --tail 1.0 --tail-share 0.03
+"""
+import argparse
+import time
+
+from cex_client2 import CexClient
+from cex_hedge import Hedger
+from cex_standin_server import StandInServer, tail_latency
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+
+
+def run(api, requests):
+    latencies = []
+    empty = 0
+    for i in range(requests):
+        started = time.time()
+        result = api.ticker("BTC/USD")
+        latencies.append(time.time() - started)
+        if result == {}:
+            empty += 1
+    return latencies, empty
+
+
+def report(name, latencies, empty):
+    print("%-10s p50 %6.1f ms  p99 %7.1f ms  max %7.1f ms  total %6.2f s  empty %s" % (
+        name, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000, max(latencies) * 1000,
+        sum(latencies), empty))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="usual latency, seconds")
+    parser.add_argument("--tail", type=float, default=1.0, help="latency of stalled requests, seconds")
+    parser.add_argument("--tail-share", type=float, default=0.03, help="share of stalled requests")
+    parser.add_argument("--budget", type=float, default=0.05, help="hedge budget, share of requests")
+    args = parser.parse_args()
+
+    server = StandInServer(latency=tail_latency(args.latency, args.tail, args.tail_share)).start()
+
+    plain = CexClient(username="bench", api_key="key", api_secret="secret", timeout=10)
+    plain.base_url = server.rest_url
+    report("plain", *run(plain, args.requests))
+
+    hedger = Hedger(budget=args.budget)
+    hedged = CexClient(username="bench", api_key="key", api_secret="secret", timeout=10, hedger=hedger)
+    hedged.base_url = server.rest_url
+    report("hedged", *run(hedged, args.requests))
+    print("Hedge stats: %s" % hedger.stats())
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+
+log = logging.getLogger(__name__)
+
+
+BUY = 1
+SELL = -1
+
+ImpactEstimate = namedtuple("ImpactEstimate", ["pair", "side", "sizes", "filled", "fill_price", "vwap", "mid",
+                                               "slippage_bps", "fully_filled"])
+
+
+def _levels_to_array(levels, depth=None):
+    if depth is not None:
+        levels = levels[:depth]
+    if len(levels) == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    return np.asarray([(level[0], level[1]) for level in levels], dtype=np.float64)
+
+
+def book_to_arrays(book, depth=None):
+    """
+    Converts an order book to (bids, asks) arrays of shape (levels, 2) with price and amount columns.
+    Accepts the REST order_book response, the data of WS order-book-subscribe / md messages
+    or the whole WS message itself.
+    """
+    if "data" in book and isinstance(book["data"], dict):
+        book = book["data"]
+
+    bids = book.get("bids", book.get("buy", []))
+    asks = book.get("asks", book.get("sell", []))
+    return _levels_to_array(bids, depth), _levels_to_array(asks, depth)
+
+
+def _pad(books, depth=None):
+    # books: list of (bids, asks) arrays; padded levels get zero amount and nan price.
+    width = max([max(len(b), len(a)) for b, a in books] + [1])
+    if depth is not None:
+        width = min(width, depth)
+
+    bid_px = np.full((len(books), width), np.nan)
+    bid_qty = np.zeros((len(books), width))
+    ask_px = np.full((len(books), width), np.nan)
+    ask_qty = np.zeros((len(books), width))
+
+    for i, (bids, asks) in enumerate(books):
+        nb = min(len(bids), width)
+        na = min(len(asks), width)
+        bid_px[i, :nb] = bids[:nb, 0]
+        bid_qty[i, :nb] = bids[:nb, 1]
+        ask_px[i, :na] = asks[:na, 0]
+        ask_qty[i, :na] = asks[:na, 1]
+
+    return bid_px, bid_qty, ask_px, ask_qty
+
+
+class BookMatrix(object):
+    """
+    Stacked, padded order books of several pairs. All estimates are computed for all pairs at once.
+    A LiveOrderBook that is stale gives an empty (NaN) row; valid is False for such pairs.
+    """
+
+    def __init__(self, books, depth=None):
+        # books: {pair: book} where book is a REST/WS order book, a (bids, asks) tuple of arrays or a LiveOrderBook.
+        self.pairs = list(books.keys())
+        arrays = []
+        self.valid = np.ones(len(self.pairs), dtype=bool)
+        for i, pair in enumerate(self.pairs):
+            book = books[pair]
+            if isinstance(book, LiveOrderBook):
+                if book.valid:
+                    arrays.append(book.arrays(depth))
+                else:
+                    self.valid[i] = False
+                    arrays.append((_levels_to_array([]), _levels_to_array([])))
+            elif isinstance(book, tuple):
+                arrays.append((np.asarray(book[0], dtype=np.float64).reshape(-1, 2),
+                               np.asarray(book[1], dtype=np.float64).reshape(-1, 2)))
+            else:
+                arrays.append(book_to_arrays(book, depth))
+
+        self.bid_px, self.bid_qty, self.ask_px, self.ask_qty = _pad(arrays, depth)
+
+    def mid(self):
+        best_bid = self.bid_px[:, 0]
+        best_ask = self.ask_px[:, 0]
+        return (best_bid + best_ask) / 2.0
+
+    def _side(self, side):
+        if side == BUY or side == "buy":
+            return BUY, self.ask_px, self.ask_qty
+        elif side == "sell" or side == SELL:
+            return SELL, self.bid_px, self.bid_qty
+        raise ValueError("Unknown side %s" % side)
+
+    def estimate(self, sizes, side="buy"):
+        """
+        Walks the book for every candidate size (in base currency) of every pair.
+        sizes is either a 1-d array applied to all pairs or an array of shape (pairs, sizes).
+        Unfilled part of a size (not enough depth) is reported via filled / fully_filled.
+        """
+        sign, px, qty = self._side(side)
+        sizes = np.atleast_1d(np.asarray(sizes, dtype=np.float64))
+        if sizes.ndim == 1:
+            sizes = np.broadcast_to(sizes, (len(self.pairs), sizes.shape[0]))
+
+        notional = np.where(qty > 0, np.nan_to_num(px) * qty, 0.0)
+        cum_qty = np.cumsum(qty, axis=1)
+        cum_notional = np.cumsum(notional, axis=1)
+        total_qty = cum_qty[:, -1:]
+
+        # Number of levels completely consumed before each size is reached: (pairs, sizes)
+        consumed = np.sum(cum_qty[:, None, :] < sizes[:, :, None], axis=2)
+        last = np.minimum(consumed, px.shape[1] - 1)
+
+        rows = np.arange(len(self.pairs))[:, None]
+        qty_before = np.where(consumed > 0, cum_qty[rows, np.maximum(consumed - 1, 0)], 0.0)
+        notional_before = np.where(consumed > 0, cum_notional[rows, np.maximum(consumed - 1, 0)], 0.0)
+
+        filled = np.minimum(sizes, total_qty)
+        fully_filled = sizes <= total_qty
+        fill_price = px[rows, last]
+        partial = np.where(fully_filled, (filled - qty_before) * np.nan_to_num(fill_price), 0.0)
+        total_notional = np.where(fully_filled, notional_before + partial, cum_notional[:, -1:])
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vwap = np.where(filled > 0, total_notional / filled, np.nan)
+            mid = self.mid()[:, None]
+            slippage_bps = sign * (vwap - mid) / mid * 1e4
+
+        # Worst level touched: last non-empty level when the book runs out.
+        last_level = np.maximum(np.sum(qty > 0, axis=1) - 1, 0)
+        fill_price = np.where(fully_filled, fill_price, px[rows, last_level[:, None]])
+
+        return ImpactEstimate(pair=self.pairs, side="buy" if sign == BUY else "sell", sizes=sizes, filled=filled,
+                              fill_price=fill_price, vwap=vwap, mid=mid[:, 0], slippage_bps=slippage_bps,
+                              fully_filled=fully_filled)
+
+    def depth_within(self, bps, side="buy"):
+        """
+        Amount available within bps basis points from mid for every pair: array of shape (pairs, len(bps)).
+        """
+        sign, px, qty = self._side(side)
+        bps = np.atleast_1d(np.asarray(bps, dtype=np.float64))
+        mid = self.mid()[:, None, None]
+        limit = mid * (1 + sign * bps[None, :, None] / 1e4)
+
+        with np.errstate(invalid="ignore"):
+            if sign == BUY:
+                inside = px[:, None, :] <= limit
+            else:
+                inside = px[:, None, :] >= limit
+
+        return np.sum(np.where(inside, qty[:, None, :], 0.0), axis=2)
+
+
+def estimate(book, sizes, side="buy", depth=None):
+    return BookMatrix({"": book}, depth).estimate(sizes, side)
+
+
+class LiveOrderBook(object):
+    """
+    Order book kept up to date from CexWsClient messages: order-book-subscribe / md snapshots and md_update deltas.
+    The book is invalid until the first snapshot and again after a missed update; arrays() raises while invalid.
+    """
+
+    def __init__(self, pair=None):
+        self.pair = pair
+        self.id = None
+        self.bids = {}
+        self.asks = {}
+        self.valid = False
+
+    def reset(self, bids, asks, book_id=None):
+        self.bids = dict((float(p), float(a)) for p, a in bids)
+        self.asks = dict((float(p), float(a)) for p, a in asks)
+        self.id = book_id
+        self.valid = True
+
+    def invalidate(self):
+        self.bids = {}
+        self.asks = {}
+        self.id = None
+        self.valid = False
+
+    def _same_pair(self, pair):
+        if self.pair is None or pair is None:
+            return True
+        if isinstance(pair, list):
+            pair = ":".join(pair)
+        return pair.replace("/", ":") == self.pair.replace("/", ":")
+
+    def update(self, message):
+        e = message.get("e", None)
+        data = message.get("data", {})
+        if not isinstance(data, dict) or not self._same_pair(data.get("pair", None)):
+            return False
+
+        if e in ("order-book-subscribe", "md"):
+            bids = data.get("bids", data.get("buy", []))
+            asks = data.get("asks", data.get("sell", []))
+            self.reset(bids, asks, data.get("id", None))
+            return True
+
+        elif e == "md_update":
+            if not self.valid:
+                return False
+
+            book_id = data.get("id", None)
+            if self.id is not None and book_id is not None and book_id != self.id + 1:
+                log.warning("Order book %s: missed update %s -> %s, resubscribe required" % (self.pair, self.id,
+                                                                                             book_id))
+                self.invalidate()
+                return False
+
+            for levels, price, amount in [(self.bids, p, a) for p, a in data.get("bids", [])] + \
+                                         [(self.asks, p, a) for p, a in data.get("asks", [])]:
+                price = float(price)
+                amount = float(amount)
+                if amount == 0:
+                    levels.pop(price, None)
+                else:
+                    levels[price] = amount
+            self.id = book_id
+            return True
+
+        return False
+
+    def arrays(self, depth=None):
+        if not self.valid:
+            raise ValueError("Order book %s is stale, waiting for a new snapshot" % self.pair)
+        bids = sorted(self.bids.items(), reverse=True)
+        asks = sorted(self.asks.items())
+        return _levels_to_array(bids, depth), _levels_to_array(asks, depth)
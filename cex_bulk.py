@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from collections import namedtuple
+from threading import Condition, Lock
+
+import six
+
+
+log = logging.getLogger(__name__)
+
+
+PLACE = "place"
+CANCEL = "cancel"
+CANCEL_REPLACE = "cancel_replace"
+
+OrderIntent = namedtuple("OrderIntent", ["action", "pair", "op", "amount", "price", "order_id"])
+OrderResult = namedtuple("OrderResult", ["intent", "status", "data", "error"])
+
+# Result status. UNKNOWN means the request may or may not have reached the exchange (timeout, lost reply):
+# reconcile with open_orders / get_order before retrying, or the order may be doubled.
+OK = "ok"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+
+def place(pair, op, amount, price):
+    return OrderIntent(PLACE, pair, op, amount, price, None)
+
+
+def cancel(order_id, pair=None):
+    return OrderIntent(CANCEL, pair, None, None, None, order_id)
+
+
+def cancel_replace(order_id, pair, op, amount, price):
+    return OrderIntent(CANCEL_REPLACE, pair, op, amount, price, order_id)
+
+
+class RateLimiter(object):
+    """
+    Token bucket shared by all users of a bulk executor: at most `rate` requests per second with bursts of `burst`.
+    """
+
+    def __init__(self, rate=10.0, burst=10):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self.lock = Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class BulkWsExecutor(object):
+    """
+    Pipelines order intents over an authenticated CexWsClient connection: all requests are sent without waiting,
+    then replies are matched back by oid. This is the reliable bulk route, as there are no per-request nonces.
+    Intents without a reply within timeout are reported as UNKNOWN.
+    """
+
+    def __init__(self, ws_client, timeout=10, rate_limiter=None):
+        self.ws_client = ws_client
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter(rate=50, burst=50)
+
+    def _send(self, intent):
+        if intent.action == PLACE:
+            return self.ws_client.place_order(pair=intent.pair, op=intent.op, price=intent.price, amount=intent.amount)
+        elif intent.action == CANCEL:
+            return self.ws_client.cancel_order(intent.order_id)
+        elif intent.action == CANCEL_REPLACE:
+            return self.ws_client.cancel_replace_order(order_id=intent.order_id, pair=intent.pair, op=intent.op,
+                                                       price=intent.price, amount=intent.amount)
+        raise ValueError("Unknown order action %s" % intent.action)
+
+    def execute(self, intents):
+        intents = list(intents)
+        oids = []
+        # Per call: only replies to this call's oids are kept. An oid is registered under the condition
+        # while its request is sent, so the listener cannot see the reply before the oid is expected.
+        expected = set()
+        replies = {}
+        condition = Condition()
+
+        def on_reply(message):
+            with condition:
+                if message["oid"] in expected:
+                    replies[message["oid"]] = message
+                    condition.notify_all()
+
+        self.ws_client.reply_listeners.append(on_reply)
+        try:
+            for intent in intents:
+                self.rate_limiter.acquire()
+                with condition:
+                    try:
+                        oid = self._send(intent)
+                    except Exception as e:
+                        log.exception("Bulk %s failed: %s" % (intent.action, intent))
+                        oid = e
+                    if isinstance(oid, six.string_types):
+                        expected.add(oid)
+                oids.append(oid)
+
+            deadline = time.time() + self.timeout
+            with condition:
+                while len(replies) < len(expected):
+                    left = deadline - time.time()
+                    if left <= 0:
+                        break
+                    condition.wait(left)
+                replies = dict(replies)
+        finally:
+            self.ws_client.reply_listeners.remove(on_reply)
+
+        results = []
+        for intent, oid in zip(intents, oids):
+            if oid is None:
+                results.append(OrderResult(intent, FAILED, None, "Not authenticated"))
+            elif isinstance(oid, Exception):
+                results.append(OrderResult(intent, FAILED, None, str(oid)))
+            elif oid not in replies:
+                results.append(OrderResult(intent, UNKNOWN, None, "No reply within %s s" % self.timeout))
+            else:
+                reply = replies[oid]
+                data = reply.get("data", None)
+                if reply.get("ok", None) == "ok":
+                    results.append(OrderResult(intent, OK, data, None))
+                else:
+                    error = data.get("error", data) if isinstance(data, dict) else data
+                    results.append(OrderResult(intent, FAILED, data, error))
+        return results
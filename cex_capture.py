@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+"""
+Market-data capture daemon: subscribes to CEX.io WebSocket rooms and archives every message
+to hourly rotated, block-compressed columnar files.
+
+    CEX_USER=... CEX_KEY=... CEX_SECRET=... python cex_capture.py --pairs BTC/USD ETH/USD \\
+        --tickers --order-book-depth 10 --ohlcv 1m --out ./capture
+"""
+import argparse
+import logging
+import os
+import signal
+import struct
+import sys
+import time
+import zlib
+from array import array
+from datetime import datetime as dt
+from json import dumps, loads
+from threading import Lock, Thread
+
+import six
+from six.moves.queue import Queue, Empty
+
+from cexws_client import CexWsClient
+
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"CEXCAP1\n"
+
+# Marker rows written into the archive around a lost connection.
+GAP = "capture-gap"
+RECONNECT = "capture-reconnect"
+
+SUBSCRIBE_EVENTS = ("subscribe", "order-book-subscribe", "init-ohlcv")
+
+# Memory of a queued row besides its payload string: the tuple, timestamp, event and pair strings
+# and the queue slot (about 215 bytes measured on CPython 3 for ticker messages).
+ROW_OVERHEAD = 256
+
+
+def message_pair(message):
+    pair = message.get("pair", None)
+    data = message.get("data", None)
+    if pair is None and isinstance(data, dict):
+        pair = data.get("pair", None)
+        if pair is None and "symbol1" in data:
+            pair = "%s:%s" % (data["symbol1"], data.get("symbol2", ""))
+    if isinstance(pair, list):
+        pair = ":".join(pair)
+    return pair or ""
+
+
+def _pack_array(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tostring() if six.PY2 else values.tobytes()
+
+
+def _unpack_array(typecode, raw):
+    values = array(typecode)
+    if six.PY2:
+        values.fromstring(raw)
+    else:
+        values.frombytes(raw)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def encode_block(rows, level=6):
+    """
+    rows: list of (recv_ts, e, pair, raw message). Returns one block: a JSON header with dictionaries and
+    column sizes, followed by the zlib-compressed columns.
+    """
+    events = {}
+    pairs = {}
+    ts = array("d")
+    event_codes = array("H")
+    pair_codes = array("H")
+    lengths = array("I")
+    payloads = []
+
+    for recv_ts, e, pair, raw in rows:
+        ts.append(recv_ts)
+        event_codes.append(events.setdefault(e, len(events)))
+        pair_codes.append(pairs.setdefault(pair, len(pairs)))
+        raw = raw.encode("utf8") if isinstance(raw, six.text_type) else raw
+        lengths.append(len(raw))
+        payloads.append(raw)
+
+    columns = [("ts", "d", _pack_array(ts)), ("e", "H", _pack_array(event_codes)),
+               ("pair", "H", _pack_array(pair_codes)), ("length", "I", _pack_array(lengths)),
+               ("payload", "b", b"".join(payloads))]
+    compressed = [zlib.compress(raw, level) for _, _, raw in columns]
+
+    header = dumps({
+        "rows": len(rows),
+        "e": sorted(events, key=events.get),
+        "pair": sorted(pairs, key=pairs.get),
+        "columns": [[name, typecode, len(raw)] for (name, typecode, _), raw in zip(columns, compressed)]
+    }).encode("utf8")
+    return struct.pack("<I", len(header)) + header + b"".join(compressed)
+
+
+def _read_blocks(f):
+    # Yields (offset after the block, header, compressed columns); stops at a truncated trailing block.
+    while True:
+        size = f.read(4)
+        if len(size) == 0:
+            return
+        header = f.read(struct.unpack("<I", size)[0]) if len(size) == 4 else b""
+        try:
+            header = loads(header.decode("utf8"))
+            header["columns"]
+        except (ValueError, KeyError, TypeError):
+            log.warning("Truncated block header at offset %s of %s" % (f.tell(), f.name))
+            return
+        columns = []
+        for name, typecode, length in header["columns"]:
+            raw = f.read(length)
+            if len(raw) < length:
+                log.warning("Truncated block at offset %s of %s" % (f.tell(), f.name))
+                return
+            columns.append((name, typecode, raw))
+        yield f.tell(), header, columns
+
+
+def complete_length(path):
+    """
+    Length of the leading part of a capture file made of complete blocks, 0 if it has no valid magic.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return 0
+        end = len(MAGIC)
+        for end, _, _ in _read_blocks(f):
+            pass
+        return end
+
+
+def read_capture(path):
+    """
+    Iterates (recv_ts, e, pair, raw message) over a capture file. A truncated or corrupt trailing block
+    (daemon killed while writing) ends the iteration with a warning.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a capture file" % path)
+        for _, header, compressed in _read_blocks(f):
+            columns = {}
+            try:
+                for name, typecode, raw in compressed:
+                    raw = zlib.decompress(raw)
+                    columns[name] = raw if typecode == "b" else _unpack_array(typecode, raw)
+            except zlib.error as e:
+                log.warning("Corrupt block before offset %s of %s: %s" % (f.tell(), path, e))
+                return
+
+            offset = 0
+            payload = columns["payload"]
+            for i in range(header["rows"]):
+                end = offset + columns["length"][i]
+                yield (columns["ts"][i], header["e"][columns["e"][i]], header["pair"][columns["pair"][i]],
+                       payload[offset:end].decode("utf8"))
+                offset = end
+
+
+class CaptureWriter(object):
+    """
+    Writer thread: drains the queue and writes blocks of up to block_rows messages (or whatever arrived
+    within flush_seconds) to one file per UTC hour. The queue is bounded by the memory of the queued rows
+    (payload string plus ROW_OVERHEAD each): a row that would take it over queue_bytes is dropped and counted.
+    """
+
+    def __init__(self, out_dir, queue_bytes=64 * 1024 * 1024, block_rows=5000, flush_seconds=5.0, level=6):
+        self.out_dir = out_dir
+        self.queue = Queue()
+        self.queue_bytes = queue_bytes
+        self.queued_bytes = 0
+        self.queue_lock = Lock()
+        self.block_rows = block_rows
+        self.flush_seconds = flush_seconds
+        self.level = level
+        self.stop_flag = False
+        self.thread = None
+        self.file = None
+        self.hour = None
+
+        self.received = 0
+        self.dropped = 0
+        self.written = 0
+        self.raw_bytes = 0
+        self.file_bytes = 0
+        self.blocks = 0
+
+    @staticmethod
+    def _row_size(row):
+        return sys.getsizeof(row[3]) + ROW_OVERHEAD
+
+    def put(self, row):
+        size = self._row_size(row)
+        with self.queue_lock:
+            self.received += 1
+            if self.queued_bytes + size > self.queue_bytes:
+                self.dropped += 1
+                return
+            self.queued_bytes += size
+        self.queue.put(row)
+
+    def _get(self, timeout):
+        row = self.queue.get(timeout=timeout)
+        with self.queue_lock:
+            self.queued_bytes -= self._row_size(row)
+        return row
+
+    def _open(self, hour):
+        if self.file is not None:
+            self.file.close()
+        path = os.path.join(self.out_dir, "cex-%s.cexcap" % hour)
+        if os.path.exists(path):
+            # Restart within the hour: drop a block left half-written by a killed daemon before appending.
+            length = complete_length(path)
+            if length != os.path.getsize(path):
+                log.warning("Truncating %s from %s to %s bytes (incomplete last block)" % (
+                    path, os.path.getsize(path), length))
+            self.file = open(path, "r+b")
+            self.file.truncate(length)
+            self.file.seek(length)
+            if length == 0:
+                self.file.write(MAGIC)
+        else:
+            self.file = open(path, "wb")
+            self.file.write(MAGIC)
+        self.hour = hour
+        log.info("Writing capture to %s" % path)
+
+    def _write(self, rows):
+        # Hour of the first row decides the file; a batch spanning an hour boundary is split.
+        start = 0
+        while start < len(rows):
+            hour_end = (int(rows[start][0]) // 3600 + 1) * 3600
+            end = start + 1
+            while end < len(rows) and rows[end][0] < hour_end:
+                end += 1
+            hour = dt.utcfromtimestamp(rows[start][0]).strftime("%Y%m%d-%H")
+            if hour != self.hour:
+                self._open(hour)
+            block = encode_block(rows[start:end], self.level)
+            self.file.write(block)
+            self.file.flush()
+            self.written += end - start
+            self.raw_bytes += sum(len(row[3]) for row in rows[start:end])
+            self.file_bytes += len(block)
+            self.blocks += 1
+            start = end
+
+    def run(self):
+        rows = []
+        deadline = None
+        while True:
+            timeout = 1.0 if deadline is None else max(0.0, min(1.0, deadline - time.time()))
+            try:
+                rows.append(self._get(timeout))
+                if deadline is None:
+                    deadline = time.time() + self.flush_seconds
+            except Empty:
+                pass
+
+            stopping = self.stop_flag and self.queue.empty()
+            if rows and (len(rows) >= self.block_rows or time.time() >= deadline or stopping):
+                try:
+                    self._write(rows)
+                except Exception:
+                    log.exception("Failed to write %s captured messages" % len(rows))
+                rows = []
+                deadline = None
+            if stopping and not rows:
+                break
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def start(self):
+        if not os.path.isdir(self.out_dir):
+            os.makedirs(self.out_dir)
+        self.thread = Thread(target=self.run, name="CEXCAPTURE")
+        self.thread.start()
+
+    def stop(self):
+        self.stop_flag = True
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+
+
+class CaptureWsClient(CexWsClient):
+    """
+    CexWsClient which decodes each message once, forwards it to a CaptureWriter instead of printing it
+    and subscribes again after every (re)authentication. A lost connection is reopened right away with
+    a short backoff and leaves capture-gap / capture-reconnect marker rows in the archive.
+    """
+
+    max_backoff = 5.0
+
+    def __init__(self, user, key, secret, writer, pairs, tickers=True, order_book_depth=0, ohlcv=None):
+        super(CaptureWsClient, self).__init__(user, key, secret)
+        self.writer = writer
+        self.pairs = pairs
+        self.tickers = tickers
+        self.order_book_depth = order_book_depth
+        self.ohlcv = ohlcv
+        self.backoff = 0.1
+        self.disconnected_at = None
+        self.reconnects = 0
+        self.subscribe_errors = 0
+
+    def subscribe_all(self):
+        if self.tickers:
+            self.subscribe_to_tickers()
+        for pair in self.pairs:
+            if self.order_book_depth:
+                self.subscribe_to_order_book(pair, self.order_book_depth)
+            if self.ohlcv:
+                self.subscribe_to_ohlcv(pair, self.ohlcv)
+
+    def _marker(self, e, data):
+        now = time.time()
+        self.writer.put((now, e, "", dumps({"e": e, "time": now, "data": data})))
+
+    def on_message(self, ws, message):
+        recv_ts = time.time()
+        decoded = loads(message)
+        e = decoded.get("e", None)
+
+        if e == "ping":
+            self.send_message({"e": "pong"})
+            return
+
+        elif e == "auth":
+            if decoded.get("ok", None) == "ok":
+                self.is_authenticated = True
+                self.backoff = 0.1
+                if self.disconnected_at is not None:
+                    self._marker(RECONNECT, {"gap_seconds": recv_ts - self.disconnected_at})
+                    self.disconnected_at = None
+                self.subscribe_all()
+            else:
+                log.error("Not authenticated: %s" % decoded)
+                return
+
+        elif e in SUBSCRIBE_EVENTS and decoded.get("ok", "ok") != "ok":
+            self.subscribe_errors += 1
+            log.error("Subscription rejected: %s" % message)
+
+        self.writer.put((recv_ts, e or "", message_pair(decoded), message))
+
+    def send_message(self, message):
+        self.connection.send(dumps(message))
+        return message.get("oid", None)
+
+    def on_error(self, ws, error):
+        # Only logged: on_close always follows and reconnects.
+        log.error("Error in WebSocket connection to %s: %s" % (self.url, error))
+
+    def on_close(self, ws):
+        self.connection = None
+        self.is_authenticated = False
+        if self.disconnected_at is None:
+            self.disconnected_at = time.time()
+            self._marker(GAP, {"url": self.url})
+        if self.stop_flag:
+            return
+
+        log.warning("WebSocket connection to %s lost, reconnecting in %.1f s" % (self.url, self.backoff))
+        time.sleep(self.backoff)
+        self.backoff = min(self.backoff * 2, self.max_backoff)
+        if not self.stop_flag:
+            self.reconnects += 1
+            self.connect_and_run()
+
+    def close(self, timeout=10):
+        self.stop_flag = True
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            connection, thread = self.connection, self.connection_thread
+            if connection is not None:
+                connection.close()
+            if thread is None or not thread.is_alive():
+                return
+            thread.join(0.5)
+        log.error("WebSocket thread did not stop within %s s" % timeout)
+
+
+def memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def report(writer, ws_cli, started, last):
+    now = time.time()
+    received, written = writer.received, writer.written
+    rate = (received - last[1]) / max(now - last[0], 1e-9)
+    ratio = float(writer.raw_bytes) / writer.file_bytes if writer.file_bytes else 0.0
+    rss = memory_mb()
+    log.info("Captured %s msgs (%.1f msg/s), written %s in %s blocks, queued %s (%.1f of %.0f MB), dropped %s, "
+             "%.1f MB on disk (x%.1f compression), max RSS %s MB, reconnects %s, subscribe errors %s, up %d s" % (
+                 received, rate, written, writer.blocks, writer.queue.qsize(), writer.queued_bytes / (1024.0 * 1024.0),
+                 writer.queue_bytes / (1024.0 * 1024.0), writer.dropped, writer.file_bytes / (1024.0 * 1024.0), ratio,
+                 "%.0f" % rss if rss is not None else "n/a", ws_cli.reconnects, ws_cli.subscribe_errors,
+                 now - started))
+    return now, received
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", nargs="+", default=["BTC/USD"])
+    parser.add_argument("--tickers", action="store_true", help="subscribe to the tickers room")
+    parser.add_argument("--order-book-depth", type=int, default=0, help="order book depth per pair, 0 to disable")
+    parser.add_argument("--ohlcv", default=None, help="OHLCV timeframe per pair, e.g. 1m")
+    parser.add_argument("--out", default="capture", help="output directory")
+    parser.add_argument("--queue-mb", type=float, default=64, help="max memory of messages waiting for the writer, MB")
+    parser.add_argument("--block-rows", type=int, default=5000, help="max messages per compressed block")
+    parser.add_argument("--flush-seconds", type=float, default=5.0, help="max age of an unwritten block")
+    parser.add_argument("--level", type=int, default=6, help="zlib compression level")
+    parser.add_argument("--report-seconds", type=float, default=60.0, help="stats report interval")
+    parser.add_argument("--url", default=CexWsClient.url)
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.INFO)
+
+    user = os.environ.get("CEX_USER", "")
+    key = os.environ.get("CEX_KEY", "")
+    secret = os.environ.get("CEX_SECRET", "")
+    if not key or not secret:
+        parser.error("CEX_KEY and CEX_SECRET environment variables are required")
+
+    writer = CaptureWriter(args.out, queue_bytes=int(args.queue_mb * 1024 * 1024), block_rows=args.block_rows,
+                           flush_seconds=args.flush_seconds, level=args.level)
+    ws_cli = CaptureWsClient(user, key, secret, writer, args.pairs, tickers=args.tickers,
+                             order_book_depth=args.order_book_depth, ohlcv=args.ohlcv)
+    ws_cli.url = args.url
+
+    stopping = []
+
+    def on_signal(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    writer.start()
+    ws_cli.connect_and_run()
+
+    started = time.time()
+    last = (started, 0)
+    next_report = started + args.report_seconds
+    while not stopping:
+        time.sleep(0.5)
+        if time.time() >= next_report:
+            last = report(writer, ws_cli, started, last)
+            next_report += args.report_seconds
+
+    log.info("Stopping capture...")
+    ws_cli.close()
+    writer.stop()
+    report(writer, ws_cli, started, last)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,20 +10,34 @@ log = logging.getLogger(__name__)
 
 import sys
 import time
+from functools import partial
+from threading import Lock
 
 
 class CexClient(object):
     base_url = "https://cex.io/api/"
 
-    def __init__(self, username, api_key, api_secret, timeout=None):
+    def __init__(self, username, api_key, api_secret, timeout=None, pool_size=10, hedger=None):
         self.__username = username
         self.__api_key = api_key
         self.__api_secret = api_secret
         self.__timeout = timeout
         self.__nonce_v = ''
+        self.__nonce_lock = Lock()
+        self.__session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.__session.mount('https://', adapter)
+        self.__session.mount('http://', adapter)
+        self.__hedger = hedger  # cex_hedge.Hedger, used for public GET requests only
+        if hedger is not None and timeout is None:
+            raise ValueError("A finite timeout is required with a hedger, stalled hedge copies would never end")
 
     def __nonce(self):
-        self.__nonce_v = '{:.10f}'.format(time.time() * 1000).split('.')[0]
+        # Nonce must grow with every private call, also when several calls are made within one millisecond.
+        nonce = int('{:.10f}'.format(time.time() * 1000).split('.')[0])
+        if self.__nonce_v != '' and nonce <= int(self.__nonce_v):
+            nonce = int(self.__nonce_v) + 1
+        self.__nonce_v = str(nonce)
 
     def __signature(self):
         if six.PY2:
@@ -35,7 +49,7 @@ class CexClient(object):
             signature = hmac.new(self.__api_secret.encode("utf8"), string_bytes, digestmod=hashlib.sha256).hexdigest().upper()  ##create signature
         return signature
 
-    def __execute_request(self, url, params, http_method='GET'):
+    def __execute_request(self, url, params, http_method='GET', hedge=False):
         content_type = 'application/json'
         http_headers = {'User-agent': 'client-cex.io-' + self.__username, 'Content-Type': content_type}
 
@@ -45,11 +59,17 @@ class CexClient(object):
             prms = params if http_method == 'GET' else None
             data = params if http_method == 'POST' else None
             if self.__timeout is None:
-                response = requests.request(http_method, url, params=prms, json=data, headers=http_headers, verify=False)
+                send = partial(self.__session.request, http_method, url, params=prms, json=data, headers=http_headers,
+                               verify=False)
             else:
-                response = requests.request(http_method, url, params=prms, json=data, headers=http_headers,
-                                            verify=False, timeout=self.__timeout)
-            result = response.json()
+                send = partial(self.__session.request, http_method, url, params=prms, json=data, headers=http_headers,
+                               verify=False, timeout=self.__timeout)
+
+            if hedge and self.__hedger is not None and http_method == 'GET':
+                result = self.__hedger.run(url, lambda: send().json(), timeout=self.__timeout)
+            else:
+                response = send()
+                result = response.json()
         except Exception as e:
             print(e)
             log.exception("Error while executing CEX request %s : %s %s" % (url, str(sys.exc_info()[0]), str(response)))
@@ -62,14 +82,18 @@ class CexClient(object):
         if pair != '':
             url = url + pair + '/'
 
-        if private == 1:  # add auth-data for non-public/private resources
-            self.__nonce()
-            params.update({'key': self.__api_key, 'signature': self.__signature(), 'nonce': self.__nonce_v})
-
         if http_method is None:
             http_method = 'POST' if private == 1 else 'GET'
 
-        return self.__execute_request(url, params, http_method)
+        if private == 1:  # add auth-data for non-public/private resources
+            # The exchange rejects a nonce lower than one it has already seen, so private calls are signed
+            # and sent one at a time, in nonce order, also when several threads share the client.
+            with self.__nonce_lock:
+                self.__nonce()
+                params.update({'key': self.__api_key, 'signature': self.__signature(), 'nonce': self.__nonce_v})
+                return self.__execute_request(url, params, http_method)
+
+        return self.__execute_request(url, params, http_method, hedge=True)
 
     def currency_limits(self):
         return self.api_call('currency_limits', {}, 0, '')
@@ -174,7 +198,7 @@ class CexClient(object):
     def ohlcv_new(self, pair, date_str):
         path = 'ohlcv/hd/%s/%s' % (date_str, pair)
         url = self.base_url + path
-        return self.__execute_request(url, {})
+        return self.__execute_request(url, {}, hedge=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import logging
+import sys
+import time
+from collections import deque
+from threading import Lock, Thread
+
+from six.moves.queue import Queue, Empty
+
+
+log = logging.getLogger(__name__)
+
+
+class Hedger(object):
+    """
+    Hedged requests for idempotent reads. When a request has not answered by the `percentile` of recent latencies
+    for the same key, a second copy is started and whichever answers first wins.
+    Every request earns `budget` hedge tokens (capped at `max_tokens`) and each hedge spends one,
+    so extra load stays at about `budget` of the traffic.
+    """
+
+    def __init__(self, percentile=95, budget=0.05, max_tokens=10, window=200, min_samples=20, min_delay=0.01):
+        self.percentile = percentile
+        self.budget = budget
+        self.max_tokens = max_tokens
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latencies = {}
+        self.tokens = float(max_tokens)
+        self.lock = Lock()
+
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    def record(self, key, latency):
+        with self.lock:
+            samples = self.latencies.get(key)
+            if samples is None:
+                samples = self.latencies[key] = deque(maxlen=self.window)
+            samples.append(latency)
+
+    def delay(self, key):
+        with self.lock:
+            samples = self.latencies.get(key)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+        return max(self.min_delay, ordered[index])
+
+    def _take_token(self):
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.hedged += 1
+                return True
+            self.denied += 1
+            return False
+
+    def _start(self, key, func, copy, results):
+        def target():
+            started = time.time()
+            try:
+                result = func()
+            except Exception:
+                self.record(key, time.time() - started)
+                results.put((copy, False, sys.exc_info()[1]))
+                return
+            self.record(key, time.time() - started)
+            results.put((copy, True, result))
+
+        thread = Thread(target=target, name="CEXHEDGE")
+        thread.daemon = True
+        thread.start()
+
+    def _run_inline(self, key, func, delay):
+        started = time.time()
+        try:
+            return func()
+        finally:
+            latency = time.time() - started
+            self.record(key, latency)
+            if delay is not None and latency > delay:
+                with self.lock:
+                    self.denied += 1
+
+    def run(self, key, func, timeout):
+        """
+        Runs func, hedged when possible. timeout bounds the whole call, including the hedge;
+        func itself must also give up within timeout, or threads of losing copies pile up.
+        """
+        with self.lock:
+            self.requests += 1
+            self.tokens = min(self.max_tokens, self.tokens + self.budget)
+            has_token = self.tokens >= 1
+
+        # No hedge possible: no latency history yet or budget spent, so no thread is needed either.
+        delay = self.delay(key)
+        if delay is None or not has_token:
+            return self._run_inline(key, func, delay)
+
+        deadline = time.time() + timeout
+        results = Queue()
+        self._start(key, func, 0, results)
+        running = 1
+        error = None
+
+        try:
+            copy, ok, value = results.get(timeout=delay)
+            if ok:
+                return value
+            running -= 1
+            error = value
+        except Empty:
+            pass
+
+        if running == 1 and self._take_token():
+            self._start(key, func, 1, results)
+            running += 1
+
+        while running > 0:
+            try:
+                copy, ok, value = results.get(timeout=max(0.0, deadline - time.time()))
+            except Empty:
+                raise error if error is not None else RuntimeError("Hedged request %s timed out" % key)
+            running -= 1
+            if ok:
+                if copy == 1:
+                    with self.lock:
+                        self.hedge_wins += 1
+                return value
+            error = value
+
+        raise error
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "denied": self.denied,
+                "hedge_rate": float(self.hedged) / self.requests if self.requests else 0.0,
+                "win_rate": float(self.hedge_wins) / self.hedged if self.hedged else 0.0
+            }
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for CEX.io REST and WebSocket APIs, for benchmarks only.
+Implements just enough of the protocol for CexClient / CexWsClient order calls and public reads,
+with a configurable artificial latency per request.
+"""
+import base64
+import hashlib
+import itertools
+import logging
+import random
+import socket
+import struct
+import time
+from json import dumps, loads
+from threading import Lock, Thread, Timer
+
+import six
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import urlparse
+
+
+log = logging.getLogger(__name__)
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def fixed_latency(seconds):
+    return lambda: seconds
+
+
+def tail_latency(seconds, tail_seconds, tail_share):
+    return lambda: tail_seconds if random.random() < tail_share else seconds
+
+
+def jitter_latency(seconds, jitter):
+    return lambda: max(0.0, seconds + random.uniform(-jitter, jitter))
+
+
+class Exchange(object):
+
+    def __init__(self):
+        self.order_ids = itertools.count(1000)
+        self.nonces = {}
+        self.lock = Lock()
+
+    def check_nonce(self, key, nonce):
+        # Like CEX.io: a private call is rejected unless its nonce is above the last one accepted for the key.
+        with self.lock:
+            if nonce <= self.nonces.get(key, -1):
+                return False
+            self.nonces[key] = nonce
+            return True
+
+    def new_order(self, pair, op, amount, price):
+        with self.lock:
+            order_id = next(self.order_ids)
+        return {"id": str(order_id), "time": int(time.time() * 1000), "type": op, "price": str(price),
+                "amount": str(amount), "pending": str(amount), "pair": pair}
+
+    def order_book(self, pair):
+        return {"timestamp": int(time.time()), "pair": pair.replace("/", ":"), "id": 1,
+                "bids": [[100.0 - i, 1.0] for i in range(10)], "asks": [[101.0 + i, 1.0] for i in range(10)]}
+
+    def ticker(self, pair):
+        return {"timestamp": str(int(time.time())), "pair": pair.replace("/", ":"), "low": "90", "high": "110",
+                "last": "100.5", "volume": "10", "bid": 100.0, "ask": 101.0}
+
+
+class RestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, result):
+        body = dumps(result).encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, params):
+        time.sleep(self.server.latency())
+        exchange = self.server.exchange
+        parts = [p for p in urlparse(self.path).path.split("/") if p][1:]
+        method = parts[0] if parts else ""
+        pair = "/".join(parts[1:3])
+
+        if "nonce" in params and not exchange.check_nonce(params.get("key"), int(params["nonce"])):
+            return {"error": "Nonce must be incremented"}
+
+        if method in ("place_order", "cancel_replace_order"):
+            return exchange.new_order(pair, params.get("type"), params.get("amount"), params.get("price"))
+        elif method == "cancel_order":
+            return True
+        elif method == "order_book":
+            return exchange.order_book(pair)
+        elif method == "ticker":
+            return exchange.ticker(pair)
+        elif method == "last_prices":
+            return {"e": "last_prices", "ok": "ok", "data": [{"symbol1": parts[1], "symbol2": "USD", "lprice": "100.5"}]}
+        return {"error": "Unknown method %s" % method}
+
+    def do_GET(self):
+        self._reply(self._handle({}))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        params = loads(self.rfile.read(length).decode("utf8")) if length else {}
+        self._reply(self._handle(params))
+
+
+class RestServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency, exchange):
+        BaseHTTPServer.HTTPServer.__init__(self, address, RestHandler)
+        self.latency = latency
+        self.exchange = exchange
+
+
+class WsConnection(object):
+
+    def __init__(self, sock, latency, exchange, feed_interval=0.001):
+        self.sock = sock
+        self.latency = latency
+        self.exchange = exchange
+        self.feed_interval = feed_interval
+        self.send_lock = Lock()
+
+    def handshake(self):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+
+        key = None
+        for line in request.decode("latin1").split("\r\n"):
+            if line.lower().startswith("sec-websocket-key:"):
+                key = line.split(":", 1)[1].strip()
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode("latin1")).digest()).decode("latin1")
+        self.sock.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                           "Sec-WebSocket-Accept: %s\r\n\r\n" % accept).encode("latin1"))
+        return True
+
+    def _recv_exact(self, n):
+        data = b""
+        while len(data) < n:
+            chunk = self.sock.recv(n - len(data))
+            if not chunk:
+                raise EOFError()
+            data += chunk
+        return data
+
+    def recv_frame(self):
+        b1, b2 = struct.unpack("!BB", self._recv_exact(2))
+        opcode = b1 & 0x0f
+        length = b2 & 0x7f
+        if length == 126:
+            length = struct.unpack("!H", self._recv_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self._recv_exact(8))[0]
+        mask = self._recv_exact(4) if b2 & 0x80 else b"\x00\x00\x00\x00"
+        payload = bytearray(self._recv_exact(length))
+        for i in range(len(payload)):
+            payload[i] ^= six.indexbytes(mask, i % 4)
+        return opcode, bytes(payload)
+
+    def send_frame(self, payload, opcode=0x1):
+        header = struct.pack("!B", 0x80 | opcode)
+        if len(payload) < 126:
+            header += struct.pack("!B", len(payload))
+        elif len(payload) < 65536:
+            header += struct.pack("!BH", 126, len(payload))
+        else:
+            header += struct.pack("!BQ", 127, len(payload))
+        with self.send_lock:
+            self.sock.sendall(header + payload)
+
+    def send(self, message):
+        try:
+            self.send_frame(dumps(message).encode("utf8"))
+        except socket.error:
+            pass
+
+    def reply(self, message):
+        e = message.get("e")
+        data = message.get("data", {})
+        if e == "auth":
+            return {"e": "auth", "ok": "ok", "data": {"ok": "ok"}}
+        elif e in ("place-order", "cancel-replace-order"):
+            pair = "/".join(data["pair"])
+            return {"e": e, "oid": message.get("oid"), "ok": "ok",
+                    "data": self.exchange.new_order(pair, data.get("type"), data.get("amount"), data.get("price"))}
+        elif e == "cancel-order":
+            return {"e": e, "oid": message.get("oid"), "ok": "ok", "data": {"order_id": data.get("order_id")}}
+        elif e == "subscribe" and "tickers" in message.get("rooms", []):
+            thread = Thread(target=self.feed_ticks, name="STANDIN-FEED")
+            thread.daemon = True
+            thread.start()
+            return None
+        elif e == "pong":
+            return None
+        return {"e": e, "oid": message.get("oid"), "ok": "error", "data": {"error": "Unsupported in stand-in"}}
+
+    def feed_ticks(self):
+        # Tickers room: a tick every feed_interval seconds until the connection closes.
+        prices = itertools.cycle(["100.5", "100.6", "100.4"])
+        while True:
+            message = {"e": "tick", "data": {"symbol1": "BTC", "symbol2": "USD", "price": next(prices), "open24": "99.0",
+                                             "volume": "10.0"}}
+            try:
+                self.send_frame(dumps(message).encode("utf8"))
+            except socket.error:
+                return
+            time.sleep(self.feed_interval)
+
+    def run(self):
+        try:
+            if not self.handshake():
+                return
+            while True:
+                opcode, payload = self.recv_frame()
+                if opcode == 0x8:
+                    self.send_frame(b"", 0x8)
+                    return
+                elif opcode == 0x9:
+                    self.send_frame(payload, 0xA)
+                elif opcode == 0x1:
+                    response = self.reply(loads(payload.decode("utf8")))
+                    if response is not None:
+                        # Replies are delayed independently, so pipelined requests overlap like on a real exchange.
+                        Timer(self.latency(), self.send, [response]).start()
+        except (EOFError, socket.error):
+            pass
+        finally:
+            self.sock.close()
+
+
+class WsServer(object):
+
+    def __init__(self, address, latency, exchange):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(address)
+        self.sock.listen(16)
+        self.server_address = self.sock.getsockname()
+        self.latency = latency
+        self.exchange = exchange
+        self.connections = []
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.error:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = WsConnection(conn, self.latency, self.exchange)
+            self.connections.append(connection)
+            thread = Thread(target=connection.run, name="STANDIN-WS")
+            thread.daemon = True
+            thread.start()
+
+    def drop_connections(self):
+        # Simulates a network failure: open connections are cut without a close frame.
+        connections, self.connections = self.connections, []
+        for connection in connections:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def shutdown(self):
+        self.sock.close()
+
+
+class StandInServer(object):
+    """
+    Starts REST and WebSocket stand-ins on local ports. Use rest_url / ws_url as CexClient.base_url / CexWsClient.url.
+    """
+
+    def __init__(self, latency=None, host="127.0.0.1"):
+        latency = latency if latency is not None else fixed_latency(0.05)
+        exchange = Exchange()
+        self.rest = RestServer((host, 0), latency, exchange)
+        self.ws = WsServer((host, 0), latency, exchange)
+        self.rest_url = "http://%s:%s/api/" % self.rest.server_address[:2]
+        self.ws_url = "ws://%s:%s/ws" % self.ws.server_address[:2]
+
+    def start(self):
+        for target, name in ((self.rest.serve_forever, "STANDIN-REST"), (self.ws.serve_forever, "STANDIN-WSACCEPT")):
+            thread = Thread(target=target, name=name)
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def stop(self):
+        self.rest.shutdown()
+        self.ws.shutdown()
@@ -5,6 +5,7 @@ import websocket
 import logging
 import ssl
 import six
+from itertools import count
 from json import dumps, loads
 from functools import partial
 from datetime import datetime as dt
@@ -44,6 +45,8 @@ class CexWsClient(object):
         self.connection = None
         self.connection_thread = None
         self.is_authenticated = False
+        self.oid_seq = count()
+        self.reply_listeners = []
 
     def nonce(self):
         return str(utc_timestamp())
@@ -58,7 +61,7 @@ class CexWsClient(object):
         return signature
 
     def get_oid(self, method):
-        return "%s_%s" % (method, int(time.time()))
+        return "%s_%s_%s" % (method, int(time.time()), next(self.oid_seq))
 
     def authenticate(self):
         nonce = int(time.time())
@@ -280,6 +283,10 @@ class CexWsClient(object):
         message = loads(message)
         e = message.get("e", None)
 
+        if "oid" in message:
+            for listener in list(self.reply_listeners):
+                listener(message)
+
         if e == "ping":
             self.send_message({"e": "pong"})
 
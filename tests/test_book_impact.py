@@ -0,0 +1,105 @@
+import unittest
+
+import numpy as np
+
+from cex_book_impact import BookMatrix, LiveOrderBook, estimate
+
+
+def naive_walk(levels, size):
+    left = size
+    notional = 0.0
+    price = None
+    for p, a in levels:
+        if left <= 0:
+            break
+        take = min(a, left)
+        notional += take * p
+        left -= take
+        price = p
+    filled = size - left
+    return filled, notional / filled if filled else float("nan"), price
+
+
+class EstimateTest(unittest.TestCase):
+    book = {"bids": [[99, 1], [98, 2]], "asks": [[101, 1], [102, 2], [103, 5]]}
+
+    def test_exact_level_boundary(self):
+        r = estimate(self.book, [1.0, 3.0])
+        self.assertEqual(r.fill_price[0].tolist(), [101.0, 102.0])
+        self.assertAlmostEqual(r.vwap[0, 1], (101 + 2 * 102) / 3.0)
+        self.assertTrue(r.fully_filled.all())
+
+    def test_size_larger_than_book(self):
+        r = estimate(self.book, 10)
+        self.assertEqual(r.filled[0, 0], 8)
+        self.assertFalse(r.fully_filled[0, 0])
+        self.assertEqual(r.fill_price[0, 0], 103)
+        self.assertAlmostEqual(r.vwap[0, 0], (101 + 204 + 515) / 8.0)
+
+    def test_scalar_size(self):
+        r = estimate(self.book, 0.5, side="sell")
+        self.assertEqual(r.vwap.shape, (1, 1))
+        self.assertEqual(r.vwap[0, 0], 99)
+        self.assertAlmostEqual(r.slippage_bps[0, 0], 100.0)
+
+    def test_one_side_empty(self):
+        r = estimate({"bids": [], "asks": [[101, 1]]}, [0.5])
+        self.assertEqual(r.filled[0, 0], 0.5)
+        self.assertTrue(np.isnan(r.mid[0]))
+        r = estimate({"bids": [], "asks": [[101, 1]]}, [0.5], side="sell")
+        self.assertEqual(r.filled[0, 0], 0)
+        self.assertTrue(np.isnan(r.vwap[0, 0]))
+
+    def test_padded_books_match_naive_walk(self):
+        rng = np.random.RandomState(7)
+        books = {}
+        for i in range(20):
+            levels = rng.randint(1, 12)
+            asks = np.cumsum(rng.uniform(0.1, 1, levels)) + 100
+            books[str(i)] = {"bids": [[99, 1]], "asks": [[p, a] for p, a in zip(asks, rng.uniform(0.1, 3, levels))]}
+        sizes = [0.05, 1.0, 4.0, 40.0]
+        r = BookMatrix(books).estimate(sizes)
+        for row, pair in enumerate(r.pair):
+            for col, size in enumerate(sizes):
+                filled, vwap, price = naive_walk(books[pair]["asks"], size)
+                self.assertAlmostEqual(r.filled[row, col], filled)
+                self.assertAlmostEqual(r.vwap[row, col], vwap)
+                self.assertAlmostEqual(r.fill_price[row, col], price)
+
+    def test_depth_within(self):
+        depth = BookMatrix({"a": self.book}).depth_within([50, 150, 300])
+        self.assertEqual(depth[0].tolist(), [0, 1, 8])
+
+
+class LiveOrderBookTest(unittest.TestCase):
+
+    def snapshot(self, book_id=1, pair="BTC:USD"):
+        return {"e": "order-book-subscribe", "data": {"id": book_id, "pair": pair, "bids": [[99, 1]],
+                                                      "asks": [[101, 1]]}}
+
+    def test_ignores_other_pairs(self):
+        book = LiveOrderBook("BTC/USD")
+        book.update(self.snapshot())
+        self.assertFalse(book.update(self.snapshot(pair="ETH:USD")))
+        self.assertFalse(book.update({"e": "md_update", "data": {"id": 2, "pair": "ETH:USD", "bids": [[5, 1]],
+                                                                 "asks": []}}))
+        self.assertEqual(book.arrays()[0].tolist(), [[99, 1]])
+
+    def test_gap_invalidates_until_snapshot(self):
+        book = LiveOrderBook("BTC/USD")
+        book.update(self.snapshot())
+        book.update({"e": "md_update", "data": {"id": 3, "pair": "BTC:USD", "bids": [], "asks": []}})
+        self.assertRaises(ValueError, book.arrays)
+
+        matrix = BookMatrix({"BTC/USD": book, "ETH/USD": {"bids": [[9, 1]], "asks": [[11, 1]]}})
+        self.assertEqual(matrix.valid.tolist(), [False, True])
+        r = matrix.estimate([0.5])
+        self.assertTrue(np.isnan(r.vwap[0, 0]))
+        self.assertEqual(r.vwap[1, 0], 11)
+
+        book.update(self.snapshot(book_id=5))
+        self.assertEqual(book.arrays()[1].tolist(), [[101, 1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
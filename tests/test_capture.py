@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from cex_capture import MAGIC, ROW_OVERHEAD, CaptureWriter, encode_block, read_capture
+
+HOUR = 1792382400  # 2026-10-19 04:00:00 UTC
+
+
+def rows(start, count, step=1.0):
+    return [(start + i * step, "tick" if i % 2 else "md", "BTC:USD" if i % 3 else "",
+             u'{"e": "tick", "i": %s, "s": "é"}' % i) for i in range(count)]
+
+
+class CaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def write_file(self, name, *blocks):
+        with open(self.path(name), "wb") as f:
+            f.write(MAGIC)
+            for block in blocks:
+                f.write(block)
+        return self.path(name)
+
+    def test_round_trip(self):
+        data = rows(HOUR, 50)
+        path = self.write_file("a.cexcap", encode_block(data[:20]), encode_block(data[20:]))
+        self.assertEqual(list(read_capture(path)), data)
+
+    def test_rows_spanning_hour_boundary_are_split(self):
+        data = rows(HOUR - 5, 10)
+        writer = CaptureWriter(self.dir)
+        writer._write(data)
+        writer.file.close()
+        first = list(read_capture(self.path("cex-20261019-03.cexcap")))
+        second = list(read_capture(self.path("cex-20261019-04.cexcap")))
+        self.assertEqual(first, data[:5])
+        self.assertEqual(second, data[5:])
+        self.assertEqual(writer.blocks, 2)
+
+    def test_truncated_tail_stops_reading(self):
+        data = rows(HOUR, 20)
+        block = encode_block(data[10:])
+        path = self.write_file("a.cexcap", encode_block(data[:10]), block[:-5])
+        self.assertEqual(list(read_capture(path)), data[:10])
+
+    def test_restart_cuts_incomplete_block_before_appending(self):
+        data = rows(HOUR + 10, 30)
+        self.write_file("cex-20261019-04.cexcap", encode_block(data[:10]), encode_block(data[10:20])[:-5])
+        writer = CaptureWriter(self.dir)
+        writer._write(data[20:])
+        writer.file.close()
+        self.assertEqual(list(read_capture(self.path("cex-20261019-04.cexcap"))), data[:10] + data[20:])
+
+    def test_queue_bound_counts_row_memory(self):
+        row = rows(HOUR, 1)[0]
+        writer = CaptureWriter(self.dir, queue_bytes=2 * (ROW_OVERHEAD + len(row[3])) + ROW_OVERHEAD)
+        for _ in range(5):
+            writer.put(row)
+        self.assertEqual((writer.received, writer.dropped), (5, 3))
+        writer._get(0)
+        writer._get(0)
+        self.assertEqual(writer.queued_bytes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()